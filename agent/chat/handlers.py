@@ -14,7 +14,8 @@ Architecture decisions reflected here:
     The store lives for the process lifetime — lost on restart, which is acceptable for
     infrastructure commands. See #48 and #62.
   - The handler is the boundary between Telegram and the agent — it owns error handling
-  - Typing action is sent before the agent runs so the user sees immediate feedback
+  - Typing action is sent before the agent runs so the user sees immediate feedback;
+    the request overlaps the agent run rather than delaying it
 
 See docs/architecture.md § Chat Integration Layer and § Trust Model.
 """
@@ -24,6 +25,7 @@ from __future__ import annotations
 import asyncio
 import logging
 from typing import TYPE_CHECKING
+from weakref import WeakValueDictionary
 
 from telegram.constants import ChatAction
 
@@ -31,7 +33,9 @@ from agent.agent import run as agent_run  # re-exported for easy mocking in test
 from agent.chat.history import ConversationStore
 
 if TYPE_CHECKING:
-    from telegram import Update
+    from collections.abc import Iterator
+
+    from telegram import Bot, Update
     from telegram.ext import Application, ContextTypes
 
 logger = logging.getLogger(__name__)
@@ -45,6 +49,34 @@ TELEGRAM_MAX_MESSAGE_LEN: int = 4096
 # not the store. See agent.py § keep_recent_turns.
 DEFAULT_TTL_SECONDS: float = 1800.0
 
+# Static /start and /help replies — built once at import, sent unchanged.
+_WELCOME_MESSAGE: str = (
+    "👋 Welcome to Voxnix!\n\n"
+    "I'm your personal NixOS infrastructure orchestrator. "
+    "Talk to me in plain language to manage containers on your appliance.\n\n"
+    "Try:\n"
+    "• Spin up a dev container with git and fish\n"
+    "• List my containers\n"
+    "• Stop container dev-abc\n"
+    "• Destroy container dev-abc\n\n"
+    "Type /help for more information."
+)
+
+_HELP_MESSAGE: str = (
+    "🛠 Voxnix Help\n\n"
+    "Container management:\n"
+    "• Create: spin up a container with git and fish\n"
+    "• List: show my containers or list workloads\n"
+    "• Stop: stop container <name>\n"
+    "• Start: start container <name>\n"
+    "• Destroy: destroy container <name>\n\n"
+    "Commands:\n"
+    "/start — welcome message\n"
+    "/help — this message\n\n"
+    "Just describe what you want in plain language — "
+    "I'll figure out the right action."
+)
+
 
 # ── Owner extraction ──────────────────────────────────────────────────────────
 
@@ -97,9 +129,16 @@ def _get_conversation_store(application: Application) -> ConversationStore:
 def _get_chat_lock(application: Application, chat_id: int) -> asyncio.Lock:
     """Return the asyncio.Lock for the given chat_id, creating it if needed.
 
-    Locks are stored in application.bot_data["chat_locks"] — a dict that lives
-    for the lifetime of the Application and is shared across all handler
-    invocations. This is PTB's canonical mechanism for shared per-bot state.
+    Locks are stored in application.bot_data["chat_locks"] — a
+    WeakValueDictionary that lives for the lifetime of the Application and is
+    shared across all handler invocations. This is PTB's canonical mechanism
+    for shared per-bot state.
+
+    The store only holds weak references: a lock stays alive while some
+    handler holds or waits on it (each keeps a strong local reference), and
+    is reclaimed once its chat goes idle. Memory therefore scales with active
+    chats rather than every chat the bot has ever seen. Dropping an idle lock
+    is safe — nobody is waiting on it, and the next message creates a new one.
 
     Because PTB's event loop is single-threaded asyncio, the dict read/write
     between await points is safe with no additional synchronisation needed.
@@ -109,17 +148,58 @@ def _get_chat_lock(application: Application, chat_id: int) -> asyncio.Lock:
         chat_id: The Telegram chat ID to look up.
 
     Returns:
-        The asyncio.Lock for this chat_id (same object on every call).
+        The asyncio.Lock for this chat_id (same object for as long as any
+        caller still references it).
     """
-    locks: dict[int, asyncio.Lock] = application.bot_data.setdefault("chat_locks", {})
-    if chat_id not in locks:
-        locks[chat_id] = asyncio.Lock()
-    return locks[chat_id]
+    locks: WeakValueDictionary[int, asyncio.Lock] | None = application.bot_data.get("chat_locks")
+    if locks is None:
+        locks = application.bot_data["chat_locks"] = WeakValueDictionary()
+    lock = locks.get(chat_id)
+    if lock is None:
+        lock = locks[chat_id] = asyncio.Lock()
+    return lock
 
 
 # ── Response formatting ───────────────────────────────────────────────────────
 
 
+def _iter_chunks(text: str) -> Iterator[str]:
+    """Yield Telegram-sized chunks of ``text`` lazily.
+
+    This is the generator behind format_response — see its docstring for the
+    splitting strategy. handle_message iterates it directly so only one chunk
+    is held alongside the full response at a time.
+
+    Args:
+        text: The full agent response string.
+
+    Yields:
+        Strings of at most TELEGRAM_MAX_MESSAGE_LEN characters.
+    """
+    if len(text) <= TELEGRAM_MAX_MESSAGE_LEN:
+        yield text
+        return
+
+    start = 0
+    end = len(text)
+
+    while end - start > TELEGRAM_MAX_MESSAGE_LEN:
+        # Try to split on the last newline within the window for clean breaks.
+        split_at = text.rfind("\n", start, start + TELEGRAM_MAX_MESSAGE_LEN)
+        if split_at > start:
+            # Split just before the newline — don't include it in the chunk.
+            yield text[start:split_at]
+            start = split_at + 1  # skip the newline itself
+        else:
+            # No newline found — hard split at the limit.
+            yield text[start : start + TELEGRAM_MAX_MESSAGE_LEN]
+            start += TELEGRAM_MAX_MESSAGE_LEN
+
+    # Yield whatever is left (guaranteed ≤ TELEGRAM_MAX_MESSAGE_LEN).
+    if start < end:
+        yield text[start:]
+
+
 def format_response(text: str) -> list[str]:
     """Split an agent response into chunks that fit within Telegram's message limit.
 
@@ -138,36 +218,26 @@ def format_response(text: str) -> list[str]:
     Returns:
         A list of strings, each at most TELEGRAM_MAX_MESSAGE_LEN characters.
     """
-    if len(text) <= TELEGRAM_MAX_MESSAGE_LEN:
-        return [text]
-
-    chunks: list[str] = []
-    remaining = text
+    return list(_iter_chunks(text))
 
-    while len(remaining) > TELEGRAM_MAX_MESSAGE_LEN:
-        window = remaining[:TELEGRAM_MAX_MESSAGE_LEN]
 
-        # Try to split on the last newline within the window for clean breaks.
-        split_at = window.rfind("\n")
-        if split_at > 0:
-            # Split just before the newline — don't include it in the chunk.
-            chunk = remaining[:split_at]
-            remaining = remaining[split_at + 1 :]  # skip the newline itself
-        else:
-            # No newline found — hard split at the limit.
-            chunk = window
-            remaining = remaining[TELEGRAM_MAX_MESSAGE_LEN:]
-
-        chunks.append(chunk)
+# ── Handlers ──────────────────────────────────────────────────────────────────
 
-    # Append whatever is left (guaranteed ≤ TELEGRAM_MAX_MESSAGE_LEN).
-    if remaining:
-        chunks.append(remaining)
 
-    return chunks
+async def _send_typing(bot: Bot, chat_id: int) -> None:
+    """Send a 'typing' chat action, logging (not raising) on failure.
 
+    The indicator is cosmetic — a failed request must not prevent the agent
+    from running or the response from being delivered.
 
-# ── Handlers ──────────────────────────────────────────────────────────────────
+    Args:
+        bot: The PTB Bot instance from the handler context.
+        chat_id: The Telegram chat ID to show the indicator in.
+    """
+    try:
+        await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+    except Exception:
+        logger.warning("Failed to send typing action for chat_id=%s", chat_id, exc_info=True)
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -176,7 +246,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     Flow:
       1. Guard: skip non-text and whitespace-only messages silently.
       2. Extract owner identity from the chat_id.
-      3. Send a 'typing' chat action for immediate visual feedback.
+      3. Start a 'typing' chat action for immediate visual feedback.
       4. Run the agent with the message text and owner.
       5. Split and send the response back.
       6. On any exception, reply with a friendly error message — never propagate.
@@ -185,9 +255,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         update: The incoming Telegram update.
         context: PTB handler context (provides context.bot for API calls).
     """
-    # 1. Guard — only act on non-empty text messages.
+    # 1. Guard — only act on non-empty text messages. isspace() checks in place;
+    #    the text is stripped once, when it is handed to the agent.
     text = update.effective_message.text if update.effective_message else None
-    if not text or not text.strip():
+    if not text or text.isspace():
         return
 
     # Both are guaranteed non-None because we have a text message at this point.
@@ -208,7 +279,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # 3. Send typing indicator once we hold the lock — this way it only
         #    fires when the agent is actually about to process, not while the
         #    message is sitting in the queue waiting for a previous run.
-        await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+        #    The request runs as a task so its round-trip overlaps the agent
+        #    run; yielding once lets it go out before the agent starts.
+        typing_task = asyncio.create_task(_send_typing(context.bot, chat_id))
+        await asyncio.sleep(0)
 
         # 4. Retrieve conversation history for this chat.
         store = _get_conversation_store(context.application)
@@ -226,13 +300,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 "⚠️ Something went wrong processing your request. Please try again."
             )
             return
+        finally:
+            await typing_task
 
         # 6. Persist the new messages from this turn into the conversation store.
         store.append(owner, new_messages)
 
         # 7. Send the response, splitting at the Telegram message limit if needed.
-        chunks = format_response(response)
-        for chunk in chunks:
+        for chunk in _iter_chunks(response):
             await update.effective_message.reply_text(chunk)
 
 
@@ -246,20 +321,9 @@ async def handle_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         update: The incoming Telegram update.
         context: PTB handler context (unused, present for handler signature).
     """
-    welcome = (
-        "👋 Welcome to Voxnix!\n\n"
-        "I'm your personal NixOS infrastructure orchestrator. "
-        "Talk to me in plain language to manage containers on your appliance.\n\n"
-        "Try:\n"
-        "• Spin up a dev container with git and fish\n"
-        "• List my containers\n"
-        "• Stop container dev-abc\n"
-        "• Destroy container dev-abc\n\n"
-        "Type /help for more information."
-    )
     if update.effective_message is None:
         raise ValueError("handle_start called on an update with no effective_message")
-    await update.effective_message.reply_text(welcome)
+    await update.effective_message.reply_text(_WELCOME_MESSAGE)
 
 
 async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -271,20 +335,6 @@ async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         update: The incoming Telegram update.
         context: PTB handler context (unused, present for handler signature).
     """
-    help_text = (
-        "🛠 Voxnix Help\n\n"
-        "Container management:\n"
-        "• Create: spin up a container with git and fish\n"
-        "• List: show my containers or list workloads\n"
-        "• Stop: stop container <name>\n"
-        "• Start: start container <name>\n"
-        "• Destroy: destroy container <name>\n\n"
-        "Commands:\n"
-        "/start — welcome message\n"
-        "/help — this message\n\n"
-        "Just describe what you want in plain language — "
-        "I'll figure out the right action."
-    )
     if update.effective_message is None:
         raise ValueError("handle_help called on an update with no effective_message")
-    await update.effective_message.reply_text(help_text)
+    await update.effective_message.reply_text(_HELP_MESSAGE)
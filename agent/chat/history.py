@@ -4,9 +4,11 @@ Manages PydanticAI message histories keyed by Telegram chat_id so the agent
 can maintain context across multiple turns within a conversation.
 
 Design decisions:
-  - In-memory storage (dict) — simple, no external deps, fine for single-process bot.
-    Lost on restart, which is acceptable: infrastructure commands are mostly
+  - In-memory storage (OrderedDict) — simple, no external deps, fine for single-process
+    bot. Lost on restart, which is acceptable: infrastructure commands are mostly
     stateless, and stale history from hours ago would confuse more than help.
+    Entries are kept in least-recently-active order so the store can evict the
+    idlest chat in O(1) once it holds more than DEFAULT_MAX_CHATS conversations.
   - TTL-based expiry — conversations go stale. A message history from 30 minutes
     ago is probably still relevant; one from 6 hours ago is not. Each chat has
     a last-activity timestamp; histories older than the TTL are discarded on access.
@@ -15,6 +17,8 @@ Design decisions:
     accumulates the full raw history; the processor trims what the LLM sees.
     A hard memory cap (DEFAULT_MAX_STORE_MESSAGES) prevents unbounded growth
     in the store itself — this is a memory safety concern, not an LLM concern.
+    Each chat's messages live in a bounded deque, so the cap is enforced as
+    messages are appended rather than by re-slicing the whole history.
   - Thread-safe for asyncio — the bot's event loop is single-threaded, and
     per-chat locks in handlers.py already serialise concurrent messages from
     the same user. No additional locking needed here.
@@ -28,6 +32,7 @@ See #48 (conversation history) and #62 (TTL-based multi-turn conversation).
 from __future__ import annotations
 
 import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
@@ -50,12 +55,18 @@ DEFAULT_MAX_TURN_MESSAGES: int = DEFAULT_MAX_TURNS * 2
 # if needed in the future. 200 messages ≈ 100 turns — generous ceiling.
 DEFAULT_MAX_STORE_MESSAGES: int = 200
 
+# Hard cap on distinct chats held at once — memory safety across users.
+# TTL expiry is lazy (on access or sweep), so without this a burst of one-off
+# chats would sit in memory until someone calls active_chats(). When the cap
+# is exceeded the least recently active chat is evicted.
+DEFAULT_MAX_CHATS: int = 10_000
+
 
 @dataclass
 class _ChatHistory:
     """Internal state for a single chat's conversation history."""
 
-    messages: list[ModelMessage] = field(default_factory=list)
+    messages: deque[ModelMessage] = field(default_factory=deque)
     last_activity: float = field(default_factory=time.monotonic)
 
 
@@ -84,16 +95,23 @@ class ConversationStore:
         ttl_seconds: Seconds of inactivity after which a chat's history is
                      discarded. Resets on every ``get()`` or ``append()`` call.
                      Set to 0 or negative to disable TTL (history never expires).
+        max_chats: Hard cap on the number of chats held at once. When a new
+                   chat would exceed it, the least recently active chat is
+                   evicted. Set to 0 or negative for unlimited.
     """
 
     def __init__(
         self,
         max_messages: int = DEFAULT_MAX_STORE_MESSAGES,
         ttl_seconds: float = 1800.0,
+        max_chats: int = DEFAULT_MAX_CHATS,
     ) -> None:
         self._max_messages = max_messages
         self._ttl_seconds = ttl_seconds
-        self._chats: dict[str, _ChatHistory] = {}
+        self._max_chats = max_chats
+        # Ordered least → most recently active; every get()/append() moves the
+        # chat to the end.
+        self._chats: OrderedDict[str, _ChatHistory] = OrderedDict()
 
     @property
     def max_messages(self) -> int:
@@ -105,6 +123,11 @@ class ConversationStore:
         """Inactivity timeout in seconds before history is discarded."""
         return self._ttl_seconds
 
+    @property
+    def max_chats(self) -> int:
+        """Hard cap on the number of chats held at once (memory safety)."""
+        return self._max_chats
+
     def get(self, chat_id: str) -> list[ModelMessage]:
         """Return the current message history for a chat.
 
@@ -130,6 +153,7 @@ class ConversationStore:
 
         # Touch — accessing history resets the inactivity timer.
         entry.last_activity = time.monotonic()
+        self._chats.move_to_end(chat_id)
         return list(entry.messages)
 
     def append(self, chat_id: str, new_messages: Sequence[ModelMessage]) -> None:
@@ -137,7 +161,9 @@ class ConversationStore:
 
         Creates the history entry if it doesn't exist. Resets the TTL timer.
         If appending causes the stored messages to exceed ``max_messages``,
-        the oldest messages are dropped (memory safety cap).
+        the oldest messages are dropped (memory safety cap). If creating the
+        entry pushes the store past ``max_chats``, the least recently active
+        chat is evicted.
 
         Note: context window trimming (what the LLM sees) is handled by
         PydanticAI's history_processors, not here.
@@ -156,16 +182,17 @@ class ConversationStore:
 
         # If expired or new, start fresh.
         if entry is None or self._is_expired(entry):
-            entry = _ChatHistory()
+            # Memory safety cap — the bounded deque drops the oldest messages as
+            # new ones arrive, preventing unbounded growth in long-running sessions.
+            # This is NOT context window management (that's the history_processor's job).
+            maxlen = self._max_messages if self._max_messages > 0 else None
+            entry = _ChatHistory(messages=deque(maxlen=maxlen))
             self._chats[chat_id] = entry
+            self._evict_least_recent()
 
         entry.messages.extend(new_messages)
         entry.last_activity = time.monotonic()
-
-        # Memory safety cap — prevent unbounded growth in long-running sessions.
-        # This is NOT context window management (that's the history_processor's job).
-        if self._max_messages > 0 and len(entry.messages) > self._max_messages:
-            entry.messages = entry.messages[-self._max_messages :]
+        self._chats.move_to_end(chat_id)
 
     def clear(self, chat_id: str) -> None:
         """Remove all conversation history for a specific chat.
@@ -195,6 +222,13 @@ class ConversationStore:
             return False
         return (time.monotonic() - entry.last_activity) > self._ttl_seconds
 
+    def _evict_least_recent(self) -> None:
+        """Drop the least recently active chats until within ``max_chats``."""
+        if self._max_chats <= 0:
+            return
+        while len(self._chats) > self._max_chats:
+            self._chats.popitem(last=False)
+
     def _sweep_expired(self) -> None:
         """Remove all expired entries. Called lazily, not on a timer."""
         if self._ttl_seconds <= 0:
@@ -10,6 +10,7 @@ Results are cached by default since modules don't change at runtime
 
 from __future__ import annotations
 
+import asyncio
 import json
 
 from agent.tools.cli import CommandResult, run_command
@@ -28,6 +29,10 @@ from agent.tools.cli import CommandResult, run_command
 # increase with multi-user support. See docs/architecture.md § Deployment Workflow.
 _cache: list[str] | None = None
 
+# In-flight cached discovery, shared by concurrent callers on a cold cache so
+# a burst of first messages runs `nix eval` once rather than once per caller.
+_inflight: asyncio.Task[list[str]] | None = None
+
 
 class ModuleDiscoveryError(Exception):
     """Raised when module discovery fails."""
@@ -59,6 +64,8 @@ async def discover_modules(*, use_cache: bool = True) -> list[str]:
 
     Calls `nix eval .#lib.availableModules --json` and returns a sorted
     list of module name strings (e.g. ["fish", "git", "workspace"]).
+    Concurrent cached calls made before the cache is populated share a
+    single `nix eval` run.
 
     Args:
         use_cache: If True (default), returns cached result from a previous
@@ -71,11 +78,35 @@ async def discover_modules(*, use_cache: bool = True) -> list[str]:
         ModuleDiscoveryError: If nix eval fails, returns unparseable output,
             or returns an unexpected type.
     """
-    global _cache  # noqa: PLW0603
+    global _cache, _inflight  # noqa: PLW0603
+
+    if not use_cache:
+        return await _query_modules()
 
-    if use_cache and _cache is not None:
+    if _cache is not None:
         return _cache
 
+    if _inflight is None or _inflight.done():
+        _inflight = asyncio.create_task(_query_modules())
+    task = _inflight
+
+    try:
+        # Shielded so one caller being cancelled doesn't abort the shared query.
+        modules = await asyncio.shield(task)
+    finally:
+        # clear_cache() while the query ran resets _inflight; the stale result
+        # must not repopulate the cache it just cleared.
+        is_current = _inflight is task
+        if task.done() and is_current:
+            _inflight = None
+
+    if is_current:
+        _cache = modules
+    return modules
+
+
+async def _query_modules() -> list[str]:
+    """Run nix eval and validate its output into a sorted list of module names."""
     result = await run_nix_eval()
 
     if result.returncode != 0:
@@ -95,12 +126,7 @@ async def discover_modules(*, use_cache: bool = True) -> list[str]:
             f"Expected all module names to be strings, got: {', '.join(bad)}"
         )
 
-    modules = sorted(parsed)
-
-    if use_cache:
-        _cache = modules
-
-    return modules
+    return sorted(parsed)
 
 
 def clear_cache() -> None:
@@ -109,5 +135,6 @@ def clear_cache() -> None:
     Useful for testing or after a deployment that may have changed
     available modules.
     """
-    global _cache  # noqa: PLW0603
+    global _cache, _inflight  # noqa: PLW0603
     _cache = None
+    _inflight = None
@@ -4,11 +4,62 @@ TDD — these tests define the contract for the subprocess wrapper
 that all agent tools use to invoke Nix/systemd CLI commands.
 """
 
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import dataclasses
+import signal
+from typing import TYPE_CHECKING
+from unittest.mock import call, patch
 
 import pytest
 
-from agent.tools.cli import CommandResult, run_command
+from agent.tools.cli import CommandResult, CommandTimeoutError, run_command, run_commands
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+
+def _stream(data: bytes, *, eof: bool) -> asyncio.StreamReader:
+    """Return a StreamReader pre-loaded with data, standing in for a subprocess pipe."""
+    reader = asyncio.StreamReader()
+    if data:
+        reader.feed_data(data)
+    if eof:
+        reader.feed_eof()
+    return reader
+
+
+class _FakeProcess:
+    """Lightweight stand-in for asyncio.subprocess.Process.
+
+    Exposes only what run_command touches: pid, returncode, the stdout/stderr
+    pipes, and wait(). Tests that need a slow or blocking wait() assign their
+    own coroutine function to the ``wait`` attribute.
+    """
+
+    def __init__(self, stdout: bytes, stderr: bytes, returncode: int, *, hang: bool) -> None:
+        self.pid = 4242
+        self.stdout: asyncio.StreamReader | None = _stream(stdout, eof=not hang)
+        self.stderr: asyncio.StreamReader | None = _stream(stderr, eof=not hang)
+        self.returncode = returncode
+        self.wait_calls = 0
+        self.wait: Callable[[], Awaitable[object]] = self._wait
+
+    async def _wait(self) -> int:
+        self.wait_calls += 1
+        return self.returncode
+
+
+def _make_proc(
+    stdout: bytes = b"", stderr: bytes = b"", returncode: int = 0, *, hang: bool = False
+) -> _FakeProcess:
+    """Return a fake process whose stdout/stderr pipes yield the given bytes.
+
+    With hang=True the pipes never reach EOF, like a command still running
+    when its timeout expires; the given output is what it produced so far.
+    """
+    return _FakeProcess(stdout, stderr, returncode, hang=hang)
 
 
 class TestCommandResult:
@@ -34,14 +85,21 @@ class TestCommandResult:
         result = CommandResult(stdout="", stderr="  warning\n", returncode=0)
         assert result.stderr == "warning"
 
+    def test_is_slotted(self):
+        result = CommandResult(stdout="ok", stderr="", returncode=0)
+        assert not hasattr(result, "__dict__")
+
+    def test_is_immutable(self):
+        result = CommandResult(stdout="ok", stderr="", returncode=0)
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            result.returncode = 1  # ty: ignore[invalid-assignment]
+
 
 class TestRunCommand:
     """run_command wraps asyncio.create_subprocess_exec with structured results."""
 
     async def test_successful_command(self):
-        mock_proc = AsyncMock()
-        mock_proc.communicate.return_value = (b"hello\n", b"")
-        mock_proc.returncode = 0
+        mock_proc = _make_proc(b"hello\n")
 
         with patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc):
             result = await run_command("echo", "hello")
@@ -51,9 +109,7 @@ class TestRunCommand:
         assert result.returncode == 0
 
     async def test_failed_command(self):
-        mock_proc = AsyncMock()
-        mock_proc.communicate.return_value = (b"", b"not found\n")
-        mock_proc.returncode = 127
+        mock_proc = _make_proc(b"", b"not found\n", returncode=127)
 
         with patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc):
             result = await run_command("nonexistent")
@@ -63,35 +119,140 @@ class TestRunCommand:
         assert "not found" in result.stderr
 
     async def test_timeout_raises(self):
-        mock_proc = AsyncMock()
-        mock_proc.communicate.side_effect = TimeoutError()
-        mock_proc.kill = MagicMock()  # kill() is synchronous on asyncio.Process
-        mock_proc.wait = AsyncMock()  # wait() is async
+        mock_proc = _make_proc(hang=True)
 
         with (
             patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg"),
             pytest.raises(TimeoutError, match="timed out"),
         ):
-            await run_command("sleep", "999", timeout_seconds=1)
+            await run_command("sleep", "999", timeout_seconds=0.01)
+
+    async def test_runs_in_own_session(self):
+        """The command gets its own process group so timeouts can reach its children."""
+        mock_proc = _make_proc()
+
+        with patch(
+            "agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc
+        ) as mock_exec:
+            await run_command("nix", "build")
+
+        assert mock_exec.call_args.kwargs["start_new_session"] is True
+
+    async def test_uses_large_pipe_buffer(self):
+        """Pipes get a buffer limit above asyncio's 64 KiB default for large outputs."""
+        mock_proc = _make_proc()
+
+        with patch(
+            "agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc
+        ) as mock_exec:
+            await run_command("nix", "eval", "--json")
+
+        assert mock_exec.call_args.kwargs["limit"] == 1024 * 1024
+
+    async def test_timeout_terminates_process_group(self):
+        mock_proc = _make_proc(hang=True)
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg") as mock_killpg,
+            pytest.raises(TimeoutError),
+        ):
+            await run_command("sleep", "999", timeout_seconds=0.01)
+
+        assert mock_killpg.call_args_list[0] == call(4242, signal.SIGTERM)
+        assert mock_proc.wait_calls > 0
+
+    async def test_timeout_sigkills_group_after_command_exits_on_sigterm(self):
+        """Group members that ignore SIGTERM are SIGKILLed even once the command is gone."""
+        # wait() returns at once, so the command "exits" well inside the grace period.
+        mock_proc = _make_proc(hang=True)
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg") as mock_killpg,
+            patch("agent.tools.cli.KILL_GRACE_SECONDS", 10),
+            pytest.raises(TimeoutError),
+        ):
+            await run_command("nix", "build", timeout_seconds=0.01)
+
+        assert mock_killpg.call_args_list == [
+            call(4242, signal.SIGTERM),
+            call(4242, signal.SIGKILL),
+        ]
+
+    async def test_timeout_escalates_to_sigkill(self):
+        """A command that ignores SIGTERM is SIGKILLed after the grace period."""
+        mock_proc = _make_proc(hang=True)
+        exited = asyncio.Event()
+        mock_proc.wait = exited.wait
 
-    async def test_timeout_kills_process(self):
-        mock_proc = AsyncMock()
-        mock_proc.communicate.side_effect = TimeoutError()
-        mock_proc.kill = MagicMock()  # kill() is synchronous on asyncio.Process
-        mock_proc.wait = AsyncMock()  # wait() is async
+        def fake_killpg(pgid: int, sig: int) -> None:
+            if sig == signal.SIGKILL:
+                exited.set()
 
         with (
             patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg", side_effect=fake_killpg) as mock_killpg,
+            patch("agent.tools.cli.KILL_GRACE_SECONDS", 0.01),
             pytest.raises(TimeoutError),
         ):
-            await run_command("sleep", "999", timeout_seconds=1)
+            await run_command("sleep", "999", timeout_seconds=0.01)
 
-        mock_proc.kill.assert_called_once()
+        assert mock_killpg.call_args_list == [
+            call(4242, signal.SIGTERM),
+            call(4242, signal.SIGKILL),
+        ]
+
+    async def test_cancellation_terminates_process_group(self):
+        """A cancelled caller doesn't leave the command running in its own session."""
+        mock_proc = _make_proc(hang=True)
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg") as mock_killpg,
+        ):
+            task = asyncio.ensure_future(run_command("sleep", "999"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert mock_killpg.call_args_list == [
+            call(4242, signal.SIGTERM),
+            call(4242, signal.SIGKILL),
+        ]
+
+    async def test_timeout_tolerates_already_exited_process(self):
+        mock_proc = _make_proc(hang=True)
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg", side_effect=ProcessLookupError),
+            pytest.raises(TimeoutError, match="timed out"),
+        ):
+            await run_command("sleep", "999", timeout_seconds=0.01)
+
+    async def test_timeout_preserves_partial_output(self):
+        """Output produced before the deadline is attached to the timeout error."""
+        mock_proc = _make_proc(b"building 1/3\nbuilding 2/3\n", b"warning: slow\n", hang=True)
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc),
+            patch("agent.tools.cli.os.killpg"),
+            pytest.raises(CommandTimeoutError) as exc_info,
+        ):
+            await run_command("nix", "build", timeout_seconds=0.01)
+
+        err = exc_info.value
+        assert isinstance(err, TimeoutError)
+        assert err.stdout == "building 1/3\nbuilding 2/3"
+        assert err.stderr == "warning: slow"
+        assert err.argv == ("nix", "build")
+        assert err.timeout_seconds == 0.01
 
     async def test_passes_args_correctly(self):
-        mock_proc = AsyncMock()
-        mock_proc.communicate.return_value = (b"", b"")
-        mock_proc.returncode = 0
+        mock_proc = _make_proc()
 
         with patch(
             "agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc
@@ -104,9 +265,7 @@ class TestRunCommand:
 
     async def test_default_timeout(self):
         """Commands should have a default timeout to prevent hangs."""
-        mock_proc = AsyncMock()
-        mock_proc.communicate.return_value = (b"ok\n", b"")
-        mock_proc.returncode = 0
+        mock_proc = _make_proc(b"ok\n")
 
         with patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc):
             result = await run_command("echo", "test")
@@ -114,11 +273,32 @@ class TestRunCommand:
         # Should succeed without specifying timeout — default is applied
         assert result.success is True
 
+    async def test_output_decoded_and_stripped(self):
+        """Surrounding whitespace is stripped and multi-byte output survives decoding."""
+        mock_proc = _make_proc("\n  🟢 running  \n".encode(), b"\t\xff\n")
+
+        with patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc):
+            result = await run_command("machinectl", "list")
+
+        assert result.stdout == "🟢 running"
+        assert result.stderr == "\ufffd"
+
+    async def test_stderr_discarded_when_not_captured(self):
+        mock_proc = _make_proc(b"tank/users/1\n")
+        mock_proc.stderr = None  # stderr=DEVNULL leaves no pipe to read
+
+        with patch(
+            "agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc
+        ) as mock_exec:
+            result = await run_command("zfs", "list", "tank/users/1", capture_stderr=False)
+
+        assert mock_exec.call_args.kwargs["stderr"] == asyncio.subprocess.DEVNULL
+        assert result.stdout == "tank/users/1"
+        assert result.stderr == ""
+
     async def test_stderr_captured_on_success(self):
         """Some commands write warnings to stderr even on success."""
-        mock_proc = AsyncMock()
-        mock_proc.communicate.return_value = (b"output\n", b"warning: Git tree is dirty\n")
-        mock_proc.returncode = 0
+        mock_proc = _make_proc(b"output\n", b"warning: Git tree is dirty\n")
 
         with patch("agent.tools.cli.asyncio.create_subprocess_exec", return_value=mock_proc):
             result = await run_command("nix", "eval")
@@ -126,3 +306,79 @@ class TestRunCommand:
         assert result.success is True
         assert result.stdout == "output"
         assert "dirty" in result.stderr
+
+
+class TestRunCommands:
+    """run_commands runs independent commands concurrently with a parallelism cap."""
+
+    async def test_results_returned_in_input_order(self):
+        def make_proc(*args, **kwargs):
+            proc = _make_proc(f"{args[-1]}\n".encode())
+            return proc
+
+        with patch("agent.tools.cli.asyncio.create_subprocess_exec", side_effect=make_proc):
+            results = await run_commands([("echo", "a"), ("echo", "b"), ("echo", "c")])
+
+        assert all(isinstance(r, CommandResult) for r in results)
+        assert [r.stdout for r in results if isinstance(r, CommandResult)] == ["a", "b", "c"]
+
+    async def test_commands_overlap_up_to_max_parallel(self):
+        in_flight = 0
+        peak = 0
+        release = asyncio.Event()
+
+        async def slow_wait():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await release.wait()
+            in_flight -= 1
+            return 0
+
+        def make_proc(*args, **kwargs):
+            proc = _make_proc()
+            proc.wait = slow_wait
+            return proc
+
+        with patch(
+            "agent.tools.cli.asyncio.create_subprocess_exec", side_effect=make_proc
+        ) as mock_exec:
+            runs = asyncio.ensure_future(run_commands([("true",)] * 5, max_parallel=2))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            # Two commands are running; the other three wait for a slot.
+            assert peak == 2
+            assert mock_exec.call_count == 2
+            release.set()
+            results = await runs
+
+        assert mock_exec.call_count == 5
+        assert peak == 2
+        assert all(r.success for r in results)
+
+    async def test_failure_returned_in_place_without_cancelling_others(self):
+        procs = [_make_proc(b"ok\n"), _make_proc(hang=True), _make_proc(b"ok\n")]
+
+        with (
+            patch("agent.tools.cli.asyncio.create_subprocess_exec", side_effect=procs),
+            patch("agent.tools.cli.os.killpg"),
+        ):
+            results = await run_commands(
+                [("echo", "ok"), ("sleep", "999"), ("echo", "ok")],
+                timeout_seconds=0.01,
+                max_parallel=1,
+            )
+
+        first, second, third = results
+        assert isinstance(first, CommandResult)
+        assert first.stdout == "ok"
+        assert isinstance(second, TimeoutError)
+        assert isinstance(third, CommandResult)
+        assert third.stdout == "ok"
+
+    async def test_empty_input_returns_empty_list(self):
+        assert await run_commands([]) == []
+
+    async def test_rejects_non_positive_max_parallel(self):
+        with pytest.raises(ValueError, match="max_parallel"):
+            await run_commands([("true",)], max_parallel=0)
@@ -14,7 +14,10 @@ See #47 (diagnostic tools for the agent).
 
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, patch
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
 
 from agent.tools.cli import CommandResult
 from agent.tools.diagnostics import (
@@ -40,6 +43,37 @@ def _fail(stderr: str = "error", stdout: str = "") -> CommandResult:
     return CommandResult(stdout=stdout, stderr=stderr, returncode=1)
 
 
+# Healthy output from each check_host_health probe, in the order it runs them:
+# which extra-container, machinectl list, systemctl list-unit-files, zfs version.
+_EXTRA_CONTAINER_FOUND = _ok(stdout="/nix/store/.../extra-container")
+_MACHINECTL_OK = _ok(stdout="MACHINE CLASS SERVICE")
+_TEMPLATE_FOUND = _ok(stdout="container@.service static")
+_ZFS_VERSION = _ok(stdout="zfs-2.2.0")
+
+
+@pytest.fixture
+def patched_run_command(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """Replace run_command in the diagnostics module with a bare AsyncMock.
+
+    Tests set return_value or side_effect to script the command outputs.
+    """
+    mock = AsyncMock()
+    monkeypatch.setattr("agent.tools.diagnostics.run_command", mock)
+    return mock
+
+
+@pytest.fixture
+def patched_probe_command(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """Replace run_command where run_commands calls it, with a bare AsyncMock.
+
+    check_host_health fans its probes out through cli.run_commands. The probes
+    start in order, so a side_effect list still maps one entry to each probe.
+    """
+    mock = AsyncMock()
+    monkeypatch.setattr("agent.tools.cli.run_command", mock)
+    return mock
+
+
 # ── DiagnosticResult ──────────────────────────────────────────────────────────
 
 
@@ -62,15 +96,14 @@ class TestDiagnosticResult:
 class TestCheckHostHealth:
     """Host health check runs multiple sub-checks and aggregates results."""
 
-    async def test_all_checks_pass(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout="/nix/store/.../extra-container"),  # which extra-container
-                _ok(stdout="MACHINE CLASS SERVICE"),  # machinectl list
-                _ok(stdout="container@.service static"),  # systemctl list-unit-files
-                _ok(stdout="zfs-2.2.0"),  # zfs version
-            ]
-            result = await check_host_health()
+    async def test_all_checks_pass(self, patched_probe_command: AsyncMock):
+        patched_probe_command.side_effect = [
+            _EXTRA_CONTAINER_FOUND,  # which extra-container
+            _MACHINECTL_OK,  # machinectl list
+            _TEMPLATE_FOUND,  # systemctl list-unit-files
+            _ZFS_VERSION,  # zfs version
+        ]
+        result = await check_host_health()
 
         assert result.success is True
         assert "All checks passed" in result.output
@@ -79,95 +112,125 @@ class TestCheckHostHealth:
         assert "OK: container@.service template found" in result.output
         assert "OK: ZFS available" in result.output
 
-    async def test_extra_container_missing(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(stderr="not found"),  # which extra-container
-                _ok(),  # machinectl list
-                _ok(stdout="container@.service static"),
-                _ok(stdout="zfs-2.2.0"),
-            ]
-            result = await check_host_health()
+    @pytest.mark.parametrize(
+        ("side_effect", "expected"),
+        [
+            (
+                [_fail(stderr="not found"), _MACHINECTL_OK, _TEMPLATE_FOUND, _ZFS_VERSION],
+                "FAIL: extra-container not found",
+            ),
+            (
+                [
+                    _EXTRA_CONTAINER_FOUND,
+                    _fail(stderr="Failed to connect"),
+                    _TEMPLATE_FOUND,
+                    _ZFS_VERSION,
+                ],
+                "FAIL: machinectl",
+            ),
+            (
+                [
+                    _EXTRA_CONTAINER_FOUND,
+                    _MACHINECTL_OK,
+                    _ok(stdout="0 unit files listed."),
+                    _ZFS_VERSION,
+                ],
+                "FAIL: container@.service template not found",
+            ),
+            (
+                [
+                    _EXTRA_CONTAINER_FOUND,
+                    _MACHINECTL_OK,
+                    _TEMPLATE_FOUND,
+                    _fail(stderr="command not found"),
+                ],
+                "FAIL: zfs command failed",
+            ),
+            (
+                [TimeoutError("timed out"), _MACHINECTL_OK, _TEMPLATE_FOUND, _ZFS_VERSION],
+                "FAIL: extra-container check timed out",
+            ),
+            (
+                [_EXTRA_CONTAINER_FOUND, TimeoutError("timed out"), _TEMPLATE_FOUND, _ZFS_VERSION],
+                "FAIL: machinectl timed out",
+            ),
+        ],
+        ids=[
+            "extra-container-missing",
+            "machinectl-unresponsive",
+            "service-template-missing",
+            "zfs-unavailable",
+            "extra-container-timeout",
+            "machinectl-timeout",
+        ],
+    )
+    async def test_single_check_failure(
+        self, patched_probe_command: AsyncMock, side_effect: list, expected: str
+    ):
+        """One failing probe fails the whole check and names the culprit."""
+        patched_probe_command.side_effect = side_effect
+        result = await check_host_health()
 
         assert result.success is False
-        assert "FAIL: extra-container not found" in result.output
+        assert expected in result.output
         assert "Some checks failed" in result.output
 
-    async def test_machinectl_unresponsive(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout="/nix/store/.../extra-container"),
-                _fail(stderr="Failed to connect"),  # machinectl broken
-                _ok(stdout="container@.service static"),
-                _ok(stdout="zfs-2.2.0"),
-            ]
-            result = await check_host_health()
+    async def test_service_template_missing_suggests_fix(self, patched_probe_command: AsyncMock):
+        patched_probe_command.side_effect = [
+            _EXTRA_CONTAINER_FOUND,
+            _MACHINECTL_OK,
+            _ok(stdout="0 unit files listed."),  # no template
+            _ZFS_VERSION,
+        ]
+        result = await check_host_health()
 
-        assert result.success is False
-        assert "FAIL: machinectl" in result.output
-
-    async def test_container_service_template_missing(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout="/nix/store/.../extra-container"),
-                _ok(),
-                _ok(stdout="0 unit files listed."),  # no template
-                _ok(stdout="zfs-2.2.0"),
-            ]
-            result = await check_host_health()
-
-        assert result.success is False
-        assert "FAIL: container@.service template not found" in result.output
         assert "boot.enableContainers" in result.output
 
-    async def test_zfs_unavailable(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout="/nix/store/.../extra-container"),
-                _ok(),
-                _ok(stdout="container@.service static"),
-                _fail(stderr="command not found"),  # zfs missing
-            ]
-            result = await check_host_health()
+    async def test_probes_run_concurrently(self, patched_probe_command: AsyncMock):
+        """All four probes are in flight at once, so one slow probe doesn't delay the rest."""
+        started = 0
+        release = asyncio.Event()
+        healthy = {
+            "which": _EXTRA_CONTAINER_FOUND,
+            "machinectl": _MACHINECTL_OK,
+            "systemctl": _TEMPLATE_FOUND,
+            "zfs": _ZFS_VERSION,
+        }
 
-        assert result.success is False
-        assert "FAIL: zfs command failed" in result.output
-
-    async def test_timeout_on_extra_container_check(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                TimeoutError("timed out"),  # which extra-container
-                _ok(),
-                _ok(stdout="container@.service static"),
-                _ok(stdout="zfs-2.2.0"),
-            ]
-            result = await check_host_health()
+        async def slow_probe(*args, **kwargs):
+            nonlocal started
+            started += 1
+            if started == 4:
+                release.set()
+            await release.wait()
+            return healthy[args[0]]
 
-        assert result.success is False
-        assert "FAIL: extra-container check timed out" in result.output
-
-    async def test_timeout_on_machinectl(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout="/nix/store/.../extra-container"),
-                TimeoutError("timed out"),  # machinectl
-                _ok(stdout="container@.service static"),
-                _ok(stdout="zfs-2.2.0"),
-            ]
-            result = await check_host_health()
+        patched_probe_command.side_effect = slow_probe
+        result = await asyncio.wait_for(check_host_health(), timeout=1)
 
-        assert result.success is False
-        assert "FAIL: machinectl timed out" in result.output
-
-    async def test_multiple_failures(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(),  # extra-container
-                _fail(),  # machinectl
-                _ok(stdout="container@.service static"),
-                _fail(),  # zfs
-            ]
-            result = await check_host_health()
+        assert result.success is True
+        assert patched_probe_command.await_count == 4
+
+    async def test_unexpected_probe_error_propagates(self, patched_probe_command: AsyncMock):
+        """Only timeouts become FAIL lines; other errors surface as before."""
+        patched_probe_command.side_effect = [
+            _EXTRA_CONTAINER_FOUND,
+            _MACHINECTL_OK,
+            _TEMPLATE_FOUND,
+            OSError("exec failed"),
+        ]
+
+        with pytest.raises(OSError, match="exec failed"):
+            await check_host_health()
+
+    async def test_multiple_failures(self, patched_probe_command: AsyncMock):
+        patched_probe_command.side_effect = [
+            _fail(),  # extra-container
+            _fail(),  # machinectl
+            _TEMPLATE_FOUND,
+            _fail(),  # zfs
+        ]
+        result = await check_host_health()
 
         assert result.success is False
         assert result.output.count("FAIL:") >= 3
@@ -179,107 +242,97 @@ class TestCheckHostHealth:
 class TestGetContainerLogs:
     """Log retrieval from container journals with fallback to host journal."""
 
-    async def test_machine_journal_success(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="Jun 10 12:00:00 dev systemd: Started.")
-            result = await get_container_logs("dev")
+    async def test_machine_journal_success(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="Jun 10 12:00:00 dev systemd: Started.")
+        result = await get_container_logs("dev")
 
         assert result.success is True
         assert "Started" in result.output
         # Should use -M flag for machine journal
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "-Mdev" in call_args[0]
 
-    async def test_falls_back_to_host_journal(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(),  # machine journal fails
-                _ok(stdout="Jun 10 12:00:00 host container@dev: started"),  # host journal
-            ]
-            result = await get_container_logs("dev")
+    async def test_falls_back_to_host_journal(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            _fail(),  # machine journal fails
+            _ok(stdout="Jun 10 12:00:00 host container@dev: started"),  # host journal
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is True
         assert "host journal" in result.output
         assert "started" in result.output
 
-    async def test_machine_journal_timeout_falls_back(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                TimeoutError("timed out"),  # machine journal
-                _ok(stdout="some log output"),  # host journal
-            ]
-            result = await get_container_logs("dev")
+    async def test_machine_journal_timeout_falls_back(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            TimeoutError("timed out"),  # machine journal
+            _ok(stdout="some log output"),  # host journal
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is True
         assert "some log output" in result.output
 
-    async def test_both_journals_fail(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(stderr="No such machine"),
-                _fail(stderr="No data available"),
-            ]
-            result = await get_container_logs("dev")
+    async def test_both_journals_fail(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            _fail(stderr="No such machine"),
+            _fail(stderr="No data available"),
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is False
         assert result.error is not None
         assert "dev" in result.error
 
-    async def test_both_journals_timeout(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                TimeoutError("timed out"),
-                TimeoutError("timed out"),
-            ]
-            result = await get_container_logs("dev")
+    async def test_both_journals_timeout(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            TimeoutError("timed out"),
+            TimeoutError("timed out"),
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is False
         assert result.error is not None
         assert "timed out" in result.error
 
-    async def test_custom_line_count(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="log line")
-            await get_container_logs("dev", lines=10)
+    async def test_custom_line_count(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="log line")
+        await get_container_logs("dev", lines=10)
 
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "-n10" in call_args[0]
 
-    async def test_line_count_capped_at_200(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="log line")
-            await get_container_logs("dev", lines=999)
+    async def test_line_count_capped_at_200(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="log line")
+        await get_container_logs("dev", lines=999)
 
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "-n200" in call_args[0]
 
-    async def test_default_line_count(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="log line")
-            await get_container_logs("dev")
+    async def test_default_line_count(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="log line")
+        await get_container_logs("dev")
 
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert f"-n{DEFAULT_LOG_LINES}" in call_args[0]
 
-    async def test_empty_host_journal_returns_no_entries(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(),  # machine journal fails
-                _ok(stdout=""),  # empty host journal
-            ]
-            result = await get_container_logs("dev")
+    async def test_empty_host_journal_returns_no_entries(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            _fail(),  # machine journal fails
+            _ok(stdout=""),  # empty host journal
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is True
         assert "No log entries" in result.output
 
-    async def test_empty_machine_journal_falls_back(self):
+    async def test_empty_machine_journal_falls_back(self, patched_run_command: AsyncMock):
         """Machine journal returns success but empty stdout — should fall back."""
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _ok(stdout=""),  # machine journal empty
-                _ok(stdout="host log line"),  # host journal
-            ]
-            result = await get_container_logs("dev")
+        patched_run_command.side_effect = [
+            _ok(stdout=""),  # machine journal empty
+            _ok(stdout="host log line"),  # host journal
+        ]
+        result = await get_container_logs("dev")
 
         assert result.success is True
         assert "host log line" in result.output
@@ -291,66 +344,61 @@ class TestGetContainerLogs:
 class TestGetContainerStatus:
     """Container status via machinectl with systemctl fallback."""
 
-    async def test_running_container_via_machinectl(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="Machine: dev\nState: running\nLeader: 1234")
-            result = await get_container_status("dev")
+    async def test_running_container_via_machinectl(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="Machine: dev\nState: running\nLeader: 1234")
+        result = await get_container_status("dev")
 
         assert result.success is True
         assert "running" in result.output
         # machinectl status <name> should be the first call
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "machinectl" in call_args[0]
         assert "dev" in call_args[0]
 
-    async def test_stopped_container_via_systemctl(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(),  # machinectl status — container not running
-                CommandResult(
-                    stdout=(
-                        "container@dev.service - NixOS Container\n"
-                        "  Loaded: loaded\n  Active: inactive (dead)"
-                    ),
-                    stderr="",
-                    returncode=3,  # systemctl returns 3 for inactive
+    async def test_stopped_container_via_systemctl(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            _fail(),  # machinectl status — container not running
+            CommandResult(
+                stdout=(
+                    "container@dev.service - NixOS Container\n"
+                    "  Loaded: loaded\n  Active: inactive (dead)"
                 ),
-            ]
-            result = await get_container_status("dev")
+                stderr="",
+                returncode=3,  # systemctl returns 3 for inactive
+            ),
+        ]
+        result = await get_container_status("dev")
 
         assert result.success is True
         assert "inactive" in result.output
 
-    async def test_container_not_found(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                _fail(),  # machinectl
-                CommandResult(stdout="", stderr="", returncode=4),  # systemctl — not found
-            ]
-            result = await get_container_status("ghost")
+    async def test_container_not_found(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            _fail(),  # machinectl
+            CommandResult(stdout="", stderr="", returncode=4),  # systemctl — not found
+        ]
+        result = await get_container_status("ghost")
 
         assert result.success is False
         assert result.error is not None
         assert "ghost" in result.error
 
-    async def test_machinectl_timeout_falls_back(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                TimeoutError("timed out"),
-                _ok(stdout="Active: active (running)"),
-            ]
-            result = await get_container_status("dev")
+    async def test_machinectl_timeout_falls_back(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            TimeoutError("timed out"),
+            _ok(stdout="Active: active (running)"),
+        ]
+        result = await get_container_status("dev")
 
         assert result.success is True
         assert "active" in result.output
 
-    async def test_both_timeout(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = [
-                TimeoutError("timed out"),
-                TimeoutError("timed out"),
-            ]
-            result = await get_container_status("dev")
+    async def test_both_timeout(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = [
+            TimeoutError("timed out"),
+            TimeoutError("timed out"),
+        ]
+        result = await get_container_status("dev")
 
         assert result.success is False
         assert result.error is not None
@@ -363,52 +411,49 @@ class TestGetContainerStatus:
 class TestGetTailscaleStatus:
     """Tailscale status inside a container or on the host."""
 
-    async def test_container_tailscale_status(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="100.83.13.65 dev dev.tail1234.ts.net linux -")
-            result = await get_tailscale_status("dev")
+    async def test_container_tailscale_status(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(
+            stdout="100.83.13.65 dev dev.tail1234.ts.net linux -"
+        )
+        result = await get_tailscale_status("dev")
 
         assert result.success is True
         assert "100.83.13.65" in result.output
         # Should use nixos-container run
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "nixos-container" in call_args[0]
         assert "dev" in call_args[0]
         assert "tailscale" in call_args[0]
 
-    async def test_host_tailscale_status(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="100.10.0.1 host")
-            result = await get_tailscale_status(None)
+    async def test_host_tailscale_status(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="100.10.0.1 host")
+        result = await get_tailscale_status(None)
 
         assert result.success is True
         assert "100.10.0.1" in result.output
         # Should NOT use nixos-container run
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "nixos-container" not in call_args[0]
         assert "tailscale" in call_args[0]
 
-    async def test_tailscale_not_running(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _fail(stderr="tailscale is not running")
-            result = await get_tailscale_status("dev")
+    async def test_tailscale_not_running(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _fail(stderr="tailscale is not running")
+        result = await get_tailscale_status("dev")
 
         assert result.success is False
         assert "not running" in result.output
 
-    async def test_tailscale_timeout(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = TimeoutError("timed out")
-            result = await get_tailscale_status("dev")
+    async def test_tailscale_timeout(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = TimeoutError("timed out")
+        result = await get_tailscale_status("dev")
 
         assert result.success is False
         assert result.error is not None
         assert "timed out" in result.error
 
-    async def test_no_output_returns_placeholder(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="")
-            result = await get_tailscale_status("dev")
+    async def test_no_output_returns_placeholder(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(stdout="")
+        result = await get_tailscale_status("dev")
 
         assert result.success is True
         assert result.output == "(no output)"
@@ -420,24 +465,22 @@ class TestGetTailscaleStatus:
 class TestGetServiceStatus:
     """Host service status checks with allowlist enforcement."""
 
-    async def test_allowed_service_running(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(
-                stdout="voxnix-agent.service - Voxnix Agent\n  Active: active (running)"
-            )
-            result = await get_service_status("voxnix-agent")
+    async def test_allowed_service_running(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = _ok(
+            stdout="voxnix-agent.service - Voxnix Agent\n  Active: active (running)"
+        )
+        result = await get_service_status("voxnix-agent")
 
         assert result.success is True
         assert "active (running)" in result.output
 
-    async def test_allowed_service_inactive(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = CommandResult(
-                stdout="tailscaled.service\n  Active: inactive (dead)",
-                stderr="",
-                returncode=3,
-            )
-            result = await get_service_status("tailscaled")
+    async def test_allowed_service_inactive(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = CommandResult(
+            stdout="tailscaled.service\n  Active: inactive (dead)",
+            stderr="",
+            returncode=3,
+        )
+        result = await get_service_status("tailscaled")
 
         # Exit code 3 = inactive; still a valid diagnostic result
         assert result.success is True
@@ -451,58 +494,56 @@ class TestGetServiceStatus:
         assert "not in the allowed" in result.error
         assert "mysql" in result.error
 
-    async def test_all_allowed_services_accepted(self):
-        """Every service in the allowlist should be accepted."""
-        allowed = {
+    @pytest.mark.parametrize(
+        "svc",
+        [
             "voxnix-agent",
             "tailscaled",
             "nix-daemon",
             "systemd-machined",
             "systemd-networkd",
             "sshd",
-        }
-        for svc in allowed:
-            with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-                mock_cmd.return_value = _ok(stdout=f"{svc}.service - Active: active")
-                result = await get_service_status(svc)
-                assert result.success is True, f"Service '{svc}' should be allowed"
+        ],
+    )
+    async def test_all_allowed_services_accepted(self, patched_run_command: AsyncMock, svc: str):
+        """Every service in the allowlist should be accepted."""
+        patched_run_command.return_value = _ok(stdout=f"{svc}.service - Active: active")
+        result = await get_service_status(svc)
+
+        assert result.success is True
 
-    async def test_service_timeout(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.side_effect = TimeoutError("timed out")
-            result = await get_service_status("nix-daemon")
+    async def test_service_timeout(self, patched_run_command: AsyncMock):
+        patched_run_command.side_effect = TimeoutError("timed out")
+        result = await get_service_status("nix-daemon")
 
         assert result.success is False
         assert result.error is not None
         assert "timed out" in result.error
 
-    async def test_no_output_returns_error(self):
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = CommandResult(stdout="", stderr="", returncode=4)
-            result = await get_service_status("sshd")
+    async def test_no_output_returns_error(self, patched_run_command: AsyncMock):
+        patched_run_command.return_value = CommandResult(stdout="", stderr="", returncode=4)
+        result = await get_service_status("sshd")
 
         assert result.success is False
         assert result.error is not None
         assert "sshd" in result.error
 
-    async def test_uses_service_suffix(self):
+    async def test_uses_service_suffix(self, patched_run_command: AsyncMock):
         """The command should query <name>.service, not just <name>."""
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = _ok(stdout="active")
-            await get_service_status("nix-daemon")
+        patched_run_command.return_value = _ok(stdout="active")
+        await get_service_status("nix-daemon")
 
-        call_args = mock_cmd.call_args_list[0]
+        call_args = patched_run_command.call_args_list[0]
         assert "nix-daemon.service" in call_args[0]
 
-    async def test_stderr_used_when_stdout_empty(self):
+    async def test_stderr_used_when_stdout_empty(self, patched_run_command: AsyncMock):
         """systemctl sometimes puts info on stderr for non-zero exit codes."""
-        with patch("agent.tools.diagnostics.run_command", new=AsyncMock()) as mock_cmd:
-            mock_cmd.return_value = CommandResult(
-                stdout="",
-                stderr="Unit sshd.service could not be found.",
-                returncode=4,
-            )
-            result = await get_service_status("sshd")
+        patched_run_command.return_value = CommandResult(
+            stdout="",
+            stderr="Unit sshd.service could not be found.",
+            returncode=4,
+        )
+        result = await get_service_status("sshd")
 
         # stderr has content, so it should be used
         assert result.success is True
@@ -4,6 +4,7 @@ TDD — these tests define the contract for how the agent discovers
 what modules are available without hardcoding them in Python.
 """
 
+import asyncio
 import json
 from unittest.mock import AsyncMock, patch
 
@@ -133,3 +134,73 @@ class TestDiscoverModules:
             modules = await discover_modules(use_cache=False)
 
         assert modules == []
+
+    async def test_concurrent_cold_calls_share_one_eval(self):
+        """Callers racing on an empty cache wait on a single nix eval."""
+        release = asyncio.Event()
+        mock_result = AsyncMock()
+        mock_result.returncode = 0
+        mock_result.stdout = json.dumps(["git", "fish"])
+        mock_result.stderr = ""
+
+        async def slow_eval():
+            await release.wait()
+            return mock_result
+
+        with patch("agent.nix_gen.discovery.run_nix_eval", side_effect=slow_eval) as mock_eval:
+            runs = asyncio.gather(*(discover_modules() for _ in range(3)))
+            await asyncio.sleep(0)
+            release.set()
+            results = await runs
+
+        assert results == [["fish", "git"]] * 3
+        mock_eval.assert_called_once()
+
+    async def test_clear_cache_during_inflight_query_discards_stale_result(self):
+        """A query started before clear_cache() does not repopulate the cache."""
+        release = asyncio.Event()
+        stale = AsyncMock()
+        stale.returncode = 0
+        stale.stdout = json.dumps(["git"])
+        stale.stderr = ""
+        fresh = AsyncMock()
+        fresh.returncode = 0
+        fresh.stdout = json.dumps(["fish", "git"])
+        fresh.stderr = ""
+        results = iter([stale, fresh])
+
+        async def eval_after_release():
+            await release.wait()
+            return next(results)
+
+        with patch(
+            "agent.nix_gen.discovery.run_nix_eval", side_effect=eval_after_release
+        ) as mock_eval:
+            pending = asyncio.ensure_future(discover_modules())
+            await asyncio.sleep(0)
+            clear_cache()
+            release.set()
+            assert await pending == ["git"]
+            modules = await discover_modules()
+
+        assert modules == ["fish", "git"]
+        assert mock_eval.call_count == 2
+
+    async def test_failed_cached_call_is_retried(self):
+        """A failed discovery is not cached — the next call queries again."""
+        bad = AsyncMock()
+        bad.returncode = 1
+        bad.stdout = ""
+        bad.stderr = "error: cold cache fetch failed"
+        good = AsyncMock()
+        good.returncode = 0
+        good.stdout = json.dumps(["git"])
+        good.stderr = ""
+
+        with patch("agent.nix_gen.discovery.run_nix_eval", side_effect=[bad, good]) as mock_eval:
+            with pytest.raises(ModuleDiscoveryError):
+                await discover_modules()
+            modules = await discover_modules()
+
+        assert modules == ["git"]
+        assert mock_eval.call_count == 2
@@ -285,6 +285,49 @@ class TestMemoryCap:
         assert len(store.get("chat1")) == 100
 
 
+# ── Chat count cap (LRU) ──────────────────────────────────────────────────────
+
+
+class TestChatCap:
+    """Store evicts the least recently active chat once max_chats is exceeded."""
+
+    def test_within_limit_no_eviction(self):
+        store = ConversationStore(max_chats=3)
+        for chat_id in ("a", "b", "c"):
+            store.append(chat_id, _make_turn())
+        assert set(store._chats) == {"a", "b", "c"}
+
+    def test_exceeding_limit_evicts_least_recent(self):
+        store = ConversationStore(max_chats=2)
+        store.append("a", _make_turn())
+        store.append("b", _make_turn())
+        store.append("c", _make_turn())
+        assert "a" not in store._chats
+        assert set(store._chats) == {"b", "c"}
+
+    def test_get_counts_as_activity(self):
+        store = ConversationStore(max_chats=2)
+        store.append("a", _make_turn())
+        store.append("b", _make_turn())
+        store.get("a")
+        store.append("c", _make_turn())
+        assert "b" not in store._chats
+        assert set(store._chats) == {"a", "c"}
+
+    def test_append_to_existing_chat_does_not_evict(self):
+        store = ConversationStore(max_chats=2)
+        store.append("a", _make_turn())
+        store.append("b", _make_turn())
+        store.append("a", _make_turn())
+        assert set(store._chats) == {"a", "b"}
+
+    def test_max_chats_zero_means_unlimited(self):
+        store = ConversationStore(max_chats=0)
+        for i in range(50):
+            store.append(f"chat{i}", _make_turn())
+        assert len(store._chats) == 50
+
+
 # ── clear / clear_all ────────────────────────────────────────────────────────
 
 
@@ -372,9 +415,14 @@ class TestProperties:
         store = ConversationStore(ttl_seconds=300.0)
         assert store.ttl_seconds == 300.0
 
+    def test_max_chats_property(self):
+        store = ConversationStore(max_chats=7)
+        assert store.max_chats == 7
+
     def test_default_values(self):
-        from agent.chat.history import DEFAULT_MAX_STORE_MESSAGES
+        from agent.chat.history import DEFAULT_MAX_CHATS, DEFAULT_MAX_STORE_MESSAGES
 
         store = ConversationStore()
         assert store.max_messages == DEFAULT_MAX_STORE_MESSAGES
         assert store.ttl_seconds == 1800.0
+        assert store.max_chats == DEFAULT_MAX_CHATS
@@ -163,6 +163,15 @@ def make_dispatch(
     return mock
 
 
+def existence_probes(mock_run: AsyncMock) -> dict[str, dict]:
+    """Map each dataset probed with `zfs list -H -o name <ds>` to its call kwargs."""
+    return {
+        c.args[-1]: dict(c.kwargs)
+        for c in mock_run.call_args_list
+        if c.args[:5] == ("zfs", "list", "-H", "-o", "name")
+    }
+
+
 # ── Path helpers ──────────────────────────────────────────────────────────────
 
 
@@ -767,6 +776,30 @@ class TestCreateContainerDataset:
         assert result.mount_path == MOUNT_PATH
         assert result.dataset == WORKSPACE_DS
 
+    async def test_existence_probes_discard_stderr(self):
+        """Existence probes only need the exit status, so stderr goes to /dev/null."""
+        mock_run = make_dispatch(
+            {
+                ("list", USER_DS): ok(USER_DS),
+                ("set", f"mountpoint={USER_MOUNT}", USER_DS): ok(),
+                ("get", "mounted", USER_DS): ok("yes"),
+                ("set", f"quota={DEFAULT_QUOTA}", USER_DS): ok(),
+                ("list", WORKSPACE_DS): fail("nope"),
+                ("list", CONTAINERS_DS): fail("nope"),
+                ("create", CONTAINERS_DS): ok(),
+                ("list", CONTAINER_DS): fail("nope"),
+                ("create", CONTAINER_DS): ok(),
+                ("create", WORKSPACE_DS): ok(),
+            }
+        )
+
+        with patch("agent.tools.zfs.run_command", mock_run):
+            await create_container_dataset(OWNER, CONTAINER)
+
+        probes = existence_probes(mock_run)
+        assert set(probes) == {USER_DS, WORKSPACE_DS, CONTAINERS_DS, CONTAINER_DS}
+        assert all(kwargs.get("capture_stderr") is False for kwargs in probes.values())
+
     async def test_idempotent_when_workspace_exists_and_mounted(self):
         """Workspace dataset already exists and is mounted — no create needed."""
         mock_run = make_dispatch(
@@ -1005,6 +1038,16 @@ class TestDestroyContainerDataset:
         assert len(destroy_calls) == 1
         assert destroy_calls[0][0] == ("zfs", "destroy", "-r", CONTAINER_DS)
 
+    async def test_existence_probe_discards_stderr(self):
+        mock_run = make_dispatch({("list", CONTAINER_DS): fail("does not exist")})
+
+        with patch("agent.tools.zfs.run_command", mock_run):
+            await destroy_container_dataset(OWNER, CONTAINER)
+
+        assert existence_probes(mock_run) == {
+            CONTAINER_DS: {"timeout_seconds": 10, "capture_stderr": False}
+        }
+
     async def test_succeeds_when_dataset_does_not_exist(self):
         """No dataset to destroy — treat as success (already clean)."""
         mock_run = make_dispatch(
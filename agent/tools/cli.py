@@ -4,27 +4,55 @@ All agent tools that invoke CLI commands (nix, machinectl, nixos-container,
 extra-container, zfs, etc.) go through this module. It provides:
 
 - Structured results (stdout, stderr, returncode) via CommandResult
-- Async execution via asyncio.create_subprocess_exec
-- Configurable timeouts with automatic process cleanup
+- Async execution via asyncio.create_subprocess_exec — argv is exec'd directly,
+  never through a shell, so agent-supplied names cannot inject shell syntax
+- Configurable timeouts with automatic cleanup of the command's whole process group
+  (also on cancellation); output produced before the deadline is kept on
+  CommandTimeoutError
 - Stripped output for clean parsing
+- Bounded concurrent execution of independent commands via run_commands
 """
 
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import os
+import signal
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
 
 # Default timeout for CLI commands (seconds).
 # Most nix eval / machinectl commands complete in seconds;
 # nix build can take much longer and should override this.
 DEFAULT_TIMEOUT_SECONDS = 60
 
+# Grace period between SIGTERM and SIGKILL when tearing down a timed-out command.
+# Long enough for nix to stop its builders cleanly, short enough that a wedged
+# command doesn't hold up the caller.
+KILL_GRACE_SECONDS = 0.5
+
+# Pipe buffer limit for a command's stdout/stderr, and the read size used to
+# drain them. asyncio's 64 KiB default makes multi-MB outputs (nix eval --json)
+# bounce the pipe transport through many pause/resume cycles.
+_STREAM_LIMIT_BYTES = 1024 * 1024
+
+# Default cap on concurrently running subprocesses for run_commands.
+# High enough to overlap a burst of short queries, low enough not to
+# flood the host with parallel nix evaluations.
+DEFAULT_MAX_PARALLEL = 16
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class CommandResult:
     """Structured result from a CLI invocation.
 
     All agent tools receive one of these — never raw subprocess output.
+    Immutable and slotted: results are kept around in tool output and
+    conversation history, so they carry no per-instance __dict__.
     """
 
     stdout: str
@@ -32,8 +60,9 @@ class CommandResult:
     returncode: int
 
     def __post_init__(self) -> None:
-        self.stdout = self.stdout.strip()
-        self.stderr = self.stderr.strip()
+        # Frozen dataclass — normalise fields via object.__setattr__.
+        object.__setattr__(self, "stdout", self.stdout.strip())
+        object.__setattr__(self, "stderr", self.stderr.strip())
 
     @property
     def success(self) -> bool:
@@ -41,9 +70,30 @@ class CommandResult:
         return self.returncode == 0
 
 
+class CommandTimeoutError(TimeoutError):
+    """Raised when a command exceeds its timeout.
+
+    A TimeoutError subclass, so existing ``except TimeoutError`` handlers are
+    unaffected. Carries the output the command produced before it was
+    terminated (stripped and decoded as for CommandResult), so callers can
+    report partial progress instead of re-running an expensive command.
+    """
+
+    def __init__(
+        self, argv: Sequence[str], timeout_seconds: float, *, stdout: str, stderr: str
+    ) -> None:
+        cmd_str = " ".join(argv)
+        super().__init__(f"Command timed out after {timeout_seconds}s: {cmd_str}")
+        self.argv = tuple(argv)
+        self.timeout_seconds = timeout_seconds
+        self.stdout = stdout
+        self.stderr = stderr
+
+
 async def run_command(
     *args: str,
     timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    capture_stderr: bool = True,
 ) -> CommandResult:
     """Run a CLI command asynchronously and return a structured result.
 
@@ -51,33 +101,145 @@ async def run_command(
         *args: Command and arguments (e.g. "nix", "eval", ".#lib.availableModules", "--json").
         timeout_seconds: Maximum runtime before the process is killed.
             Defaults to DEFAULT_TIMEOUT_SECONDS.
+        capture_stderr: If False, stderr is sent to /dev/null and the result's
+            stderr is empty. For probes where only the exit status matters
+            (e.g. "does this dataset exist?").
 
     Returns:
         CommandResult with stdout, stderr, and returncode.
 
     Raises:
-        TimeoutError: If the command exceeds timeout_seconds. The process is killed.
+        CommandTimeoutError: If the command exceeds timeout_seconds. The process and
+            any children it spawned are terminated; output read so far is attached.
+        asyncio.CancelledError: If the caller is cancelled. The process group is
+            terminated the same way before the cancellation propagates.
     """
+    # Own session (and so own process group) so that on timeout we can signal
+    # children too — e.g. the builders nix forks — not just the direct child.
     proc = await asyncio.create_subprocess_exec(
         *args,
         stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE if capture_stderr else asyncio.subprocess.DEVNULL,
+        start_new_session=True,
+        limit=_STREAM_LIMIT_BYTES,
     )
 
+    # Drain into buffers we own rather than via communicate(): if the deadline
+    # hits, communicate() discards what it has read, whereas these keep it.
+    stdout_buf = bytearray()
+    stderr_buf = bytearray()
+    if proc.stdout is None:
+        msg = "stdout pipe missing"
+        raise RuntimeError(msg)
+    drains = [_drain(proc.stdout, stdout_buf)]
+    if capture_stderr:
+        if proc.stderr is None:
+            msg = "stderr pipe missing"
+            raise RuntimeError(msg)
+        drains.append(_drain(proc.stderr, stderr_buf))
     try:
-        stdout_bytes, stderr_bytes = await asyncio.wait_for(
-            proc.communicate(),
+        await asyncio.wait_for(
+            asyncio.gather(*drains, proc.wait()),
             timeout=timeout_seconds,
         )
     except TimeoutError:
-        proc.kill()
-        await proc.wait()
-        cmd_str = " ".join(args)
-        msg = f"Command timed out after {timeout_seconds}s: {cmd_str}"
-        raise TimeoutError(msg) from None
+        await _terminate_process_group(proc)
+        raise CommandTimeoutError(
+            args,
+            timeout_seconds,
+            stdout=_decode_output(stdout_buf),
+            stderr=_decode_output(stderr_buf),
+        ) from None
+    except asyncio.CancelledError:
+        # The command runs in its own session, so nothing else will signal it
+        # if the caller goes away. Shielded so the teardown itself completes.
+        await asyncio.shield(_terminate_process_group(proc))
+        raise
 
     return CommandResult(
-        stdout=stdout_bytes.decode(errors="replace") if stdout_bytes else "",
-        stderr=stderr_bytes.decode(errors="replace") if stderr_bytes else "",
+        stdout=_decode_output(stdout_buf),
+        stderr=_decode_output(stderr_buf),
         returncode=proc.returncode or 0,
     )
+
+
+async def _drain(stream: asyncio.StreamReader, buf: bytearray) -> None:
+    """Append everything read from stream to buf until EOF.
+
+    Data lands in buf as it arrives, so it survives cancellation on timeout.
+    """
+    while chunk := await stream.read(_STREAM_LIMIT_BYTES):
+        buf += chunk
+
+
+def _decode_output(data: bytearray) -> str:
+    """Strip and decode raw command output.
+
+    Strips surrounding whitespace on the raw bytes before decoding, so large
+    outputs (e.g. nix eval --json) are decoded once into the final string
+    instead of decoded and then copied again by str.strip().
+    """
+    return data.strip().decode(errors="replace") if data else ""
+
+
+async def _terminate_process_group(proc: asyncio.subprocess.Process) -> None:
+    """Stop a timed-out or cancelled command and everything in its process group.
+
+    Sends SIGTERM to the group first so well-behaved commands can clean up,
+    waits up to KILL_GRACE_SECONDS for the command to exit, then SIGKILLs
+    whatever is left of the group. The process is always reaped before returning.
+    """
+    # The command started its own session, so its pid is its process group id.
+    pgid = proc.pid
+    with contextlib.suppress(ProcessLookupError):  # Already gone.
+        os.killpg(pgid, signal.SIGTERM)
+
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(proc.wait(), timeout=KILL_GRACE_SECONDS)
+
+    # SIGKILL the group even if the command itself exited on SIGTERM: members
+    # that ignore SIGTERM (e.g. a builder outliving nix) would otherwise linger.
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(pgid, signal.SIGKILL)
+    await proc.wait()
+
+
+async def run_commands(
+    commands: Iterable[Sequence[str]],
+    *,
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+) -> list[CommandResult | BaseException]:
+    """Run independent CLI commands concurrently and return their results in order.
+
+    At most ``max_parallel`` subprocesses run at once; the rest wait for a slot.
+    A failure in one command does not cancel the others — its exception
+    (e.g. TimeoutError, or CancelledError, which is a BaseException) is
+    returned in its position instead of a CommandResult.
+
+    Args:
+        commands: Argument vectors, one per command (e.g. [("zfs", "version"), ...]).
+        timeout_seconds: Per-command timeout, as for run_command.
+        max_parallel: Maximum number of commands running concurrently.
+
+    Returns:
+        One CommandResult or BaseException per command, in the order given.
+        Check entries with isinstance(r, CommandResult), not isinstance(r, Exception).
+
+    Raises:
+        ValueError: If max_parallel is less than 1.
+    """
+    if max_parallel < 1:
+        msg = f"max_parallel must be at least 1, got {max_parallel}"
+        raise ValueError(msg)
+
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def _run_bounded(args: Sequence[str]) -> CommandResult:
+        async with semaphore:
+            return await run_command(*args, timeout_seconds=timeout_seconds)
+
+    return await asyncio.gather(
+        *(_run_bounded(args) for args in commands),
+        return_exceptions=True,
+    )
@@ -4,7 +4,8 @@ Instead of surfacing vague error messages to the user, the agent can now
 inspect its own environment: check host health, read container logs, query
 Tailscale status, and inspect systemd service state.
 
-All tools are read-only CLI wrappers that go through run_command(). They
+All tools are read-only CLI wrappers that go through run_command() (or
+run_commands() for check_host_health's independent probes). They
 expose structured results that the agent can reason about and translate
 into plain-language explanations for the user.
 
@@ -28,7 +29,7 @@ from dataclasses import dataclass, field
 
 import logfire
 
-from agent.tools.cli import run_command
+from agent.tools.cli import CommandResult, run_command, run_commands
 
 logger = logging.getLogger(__name__)
 
@@ -56,10 +57,21 @@ class DiagnosticResult:
 # ── Host health ───────────────────────────────────────────────────────────────
 
 
+def _result_or_timeout(result: CommandResult | BaseException) -> CommandResult | TimeoutError:
+    """Narrow a run_commands slot for check_host_health.
+
+    Timeouts are reported as failed checks; any other exception propagates
+    as it would from a direct run_command call.
+    """
+    if isinstance(result, CommandResult | TimeoutError):
+        return result
+    raise result
+
+
 async def check_host_health() -> DiagnosticResult:
     """Run a checklist of host-level health indicators.
 
-    Checks (in order):
+    Checks (run concurrently, reported in this order):
       1. Is extra-container available on PATH?
       2. Is machinectl responsive?
       3. Is the container@.service template present?
@@ -73,65 +85,61 @@ async def check_host_health() -> DiagnosticResult:
         checks: list[str] = []
         all_ok = True
 
+        # The probes are independent, so run them together: a wedged one costs
+        # one _DIAG_TIMEOUT rather than delaying every check after it.
+        results = await run_commands(
+            [
+                ("which", "extra-container"),
+                ("machinectl", "list", "--no-pager"),
+                ("systemctl", "list-unit-files", "container@.service", "--no-pager"),
+                ("zfs", "version"),
+            ],
+            timeout_seconds=_DIAG_TIMEOUT,
+        )
+        extra_container, machinectl, template, zfs = (_result_or_timeout(r) for r in results)
+
         # 1. extra-container available?
-        try:
-            result = await run_command("which", "extra-container", timeout_seconds=_DIAG_TIMEOUT)
-            if result.success:
-                checks.append("OK: extra-container found at " + result.stdout.split("\n")[0])
-            else:
-                checks.append("FAIL: extra-container not found on PATH")
-                all_ok = False
-        except TimeoutError:
+        if isinstance(extra_container, TimeoutError):
             checks.append("FAIL: extra-container check timed out")
             all_ok = False
+        elif extra_container.success:
+            checks.append("OK: extra-container found at " + extra_container.stdout.split("\n")[0])
+        else:
+            checks.append("FAIL: extra-container not found on PATH")
+            all_ok = False
 
         # 2. machinectl responsive?
-        try:
-            result = await run_command(
-                "machinectl", "list", "--no-pager", timeout_seconds=_DIAG_TIMEOUT
-            )
-            if result.success:
-                checks.append("OK: machinectl is responsive")
-            else:
-                checks.append(f"FAIL: machinectl returned exit {result.returncode}")
-                all_ok = False
-        except TimeoutError:
+        if isinstance(machinectl, TimeoutError):
             checks.append("FAIL: machinectl timed out — systemd-machined may be stuck")
             all_ok = False
+        elif machinectl.success:
+            checks.append("OK: machinectl is responsive")
+        else:
+            checks.append(f"FAIL: machinectl returned exit {machinectl.returncode}")
+            all_ok = False
 
         # 3. container@.service template present?
-        try:
-            result = await run_command(
-                "systemctl",
-                "list-unit-files",
-                "container@.service",
-                "--no-pager",
-                timeout_seconds=_DIAG_TIMEOUT,
-            )
-            if result.success and "container@.service" in result.stdout:
-                checks.append("OK: container@.service template found")
-            else:
-                checks.append(
-                    "FAIL: container@.service template not found — "
-                    "is boot.enableContainers = true set?"
-                )
-                all_ok = False
-        except TimeoutError:
+        if isinstance(template, TimeoutError):
             checks.append("FAIL: systemctl check timed out")
             all_ok = False
+        elif template.success and "container@.service" in template.stdout:
+            checks.append("OK: container@.service template found")
+        else:
+            checks.append(
+                "FAIL: container@.service template not found — is boot.enableContainers = true set?"
+            )
+            all_ok = False
 
         # 4. ZFS available?
-        try:
-            result = await run_command("zfs", "version", timeout_seconds=_DIAG_TIMEOUT)
-            if result.success:
-                version_line = result.stdout.split("\n")[0] if result.stdout else "unknown"
-                checks.append(f"OK: ZFS available ({version_line})")
-            else:
-                checks.append("FAIL: zfs command failed — ZFS may not be installed or loaded")
-                all_ok = False
-        except TimeoutError:
+        if isinstance(zfs, TimeoutError):
             checks.append("FAIL: zfs version check timed out")
             all_ok = False
+        elif zfs.success:
+            version_line = zfs.stdout.split("\n")[0] if zfs.stdout else "unknown"
+            checks.append(f"OK: ZFS available ({version_line})")
+        else:
+            checks.append("FAIL: zfs command failed — ZFS may not be installed or loaded")
+            all_ok = False
 
         output = "\n".join(checks)
         summary = "All checks passed." if all_ok else "Some checks failed — see details above."
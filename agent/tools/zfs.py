@@ -194,7 +194,9 @@ async def _ensure_dataset(dataset: str, mountpoint: str) -> ZfsResult:
     Returns:
         ZfsResult indicating success or failure.
     """
-    check = await run_command("zfs", "list", "-H", "-o", "name", dataset, timeout_seconds=10)
+    check = await run_command(
+        "zfs", "list", "-H", "-o", "name", dataset, timeout_seconds=10, capture_stderr=False
+    )
     if check.success:
         # Dataset exists — ensure it's mounted so the directory is present
         # on the filesystem for nspawn bind mounts.
@@ -315,6 +317,7 @@ async def create_user_datasets(owner: str) -> ZfsResult:
             "name",
             dataset,
             timeout_seconds=10,
+            capture_stderr=False,
         )
         if check.success:
             logfire.info(
@@ -484,6 +487,7 @@ async def create_container_dataset(owner: str, container_name: str) -> ZfsResult
             "name",
             workspace_ds,
             timeout_seconds=10,
+            capture_stderr=False,
         )
         if check.success:
             logfire.info(
@@ -634,6 +638,7 @@ async def destroy_container_dataset(owner: str, container_name: str) -> ZfsResul
             "name",
             container_ds,
             timeout_seconds=10,
+            capture_stderr=False,
         )
         if not check.success:
             logfire.info(